@@ -3,12 +3,17 @@ Configuration parameters for phone usage detection
 """
 
 # Model paths
-PHONE_MODEL_PATH = "../models/best.pt"  # Relative path to model weights
+PHONE_MODEL_PATH = "../models/best.pt"  # Relative path to model weights (.pt, .onnx or TensorRT .engine)
+DEVICE = None  # Inference device, e.g. 0 or "cpu"; None lets Ultralytics pick
+PHONE_MODEL_INT8_PATH = "../models/best_int8.engine"  # INT8 export (TensorRT .engine or OpenVINO dir), used when PRECISION = "int8"
+PRECISION = "fp32"  # "fp32", "fp16" (CUDA only) or "int8" (loads PHONE_MODEL_INT8_PATH)
 
 # Detection thresholds
 PHONE_CONFIDENCE_THRESHOLD = 0.5
 HAND_CONFIDENCE_THRESHOLD = 0.7
 PHONE_HAND_DISTANCE_THRESHOLD = 200  # pixels - optimized for reliable hand detection
+PHONE_HAND_DISTANCE_THRESHOLD_SQ = PHONE_HAND_DISTANCE_THRESHOLD ** 2  # compared against squared distances
+USE_NUMBA = True  # Use the Numba proximity kernel when numba is installed
 
 # Motion analysis parameters
 MIN_MOTION_FRAMES = 3  # Reduced from 5 for faster detection
@@ -18,16 +23,31 @@ MAX_INACTIVE_FRAMES = 10
 
 # MediaPipe Hands configuration
 MAX_NUM_HANDS = 2
+HAND_MODEL_COMPLEXITY = 0  # 0 = lite landmark model (faster), 1 = full model
 MIN_DETECTION_CONFIDENCE = 0.1  # Very low for maximum hand detection
 MIN_TRACKING_CONFIDENCE = 0.1
 
 # Video processing
+VIDEO_DECODER = "opencv"  # "opencv" (cv2.VideoCapture) or "pyav" (requires the av package)
+PYAV_HWACCEL = "cuda"  # PyAV hardware decode device type; None for software decoding
+BATCH_SIZE = 8  # Frames per batched YOLO call
+PIN_PIPELINE_THREADS = False  # Pin decode/annotate/encode threads to separate cores (Linux)
+HW_DECODE = True  # Try hardware-accelerated decoding (VA-API/NVDEC) before the software decoder
+HW_DECODE_DEVICE = None  # Hardware decoder device index; None for the default (OpenCV rejects an index with VIDEO_ACCELERATION_ANY)
+HW_DECODE_FFMPEG_OPTIONS = "hwaccel;cuda"  # OPENCV_FFMPEG_CAPTURE_OPTIONS for NVDEC; None to leave unset
 PRESERVE_AUDIO = True
+FFMPEG_PATH = "ffmpeg"  # Used for encoding; falls back to cv2.VideoWriter if not found
+VIDEO_ENCODER = "h264_nvenc"  # Preferred FFmpeg video encoder, used if FFmpeg can run it
+VIDEO_ENCODER_ARGS = ["-preset", "p4"]  # Extra encoder options passed to FFmpeg
+FALLBACK_VIDEO_ENCODER = "libx264"  # Used when VIDEO_ENCODER is unavailable (e.g. no NVIDIA GPU)
+FALLBACK_VIDEO_ENCODER_ARGS = ["-preset", "veryfast"]
 SAVE_ANNOTATED_VIDEO = True
 GENERATE_REPORT = True
 OUTPUT_FPS = None  # Same as input video
 
 # Visualization settings
+DRAW_HAND_LANDMARKS = False  # Draw MediaPipe hand landmarks (debugging, enabled by --show-hands)
+USE_OPENCL_DRAWING = False  # Draw annotations on a cv2.UMat (OpenCL T-API); costs an upload/download per frame
 BOX_COLOR = (0, 255, 0)  # Green for active usage
 INACTIVE_COLOR = (0, 0, 255)  # Red for inactive
 TAP_TO_PAY_COLOR = (255, 0, 255)  # Magenta for tap-to-pay devices
@@ -3,80 +3,129 @@ Hand-Phone Interaction Analyzer
 Combines MediaPipe hand detection with phone detection to determine active usage
 """
 
+import os
 import cv2
 import numpy as np
 import mediapipe as mp
 from ultralytics import YOLO
 import config
 import utils
-import time
+import utils_numba
+from concurrent.futures import ThreadPoolExecutor
 
 class HandPhoneAnalyzer:
-    def __init__(self):
+    PRECISIONS = ('fp32', 'fp16', 'int8')
+    
+    def __init__(self, precision=None):
         """Initialize the hand-phone analyzer with MediaPipe and YOLO models"""
+        precision = precision or config.PRECISION
+        if precision not in self.PRECISIONS:
+            raise ValueError(f"Unsupported precision '{precision}', expected one of {self.PRECISIONS}")
+        self.precision = precision
+        
         # Initialize MediaPipe Hands
         self.mp_hands = mp.solutions.hands
         self.hands = self.mp_hands.Hands(
             static_image_mode=False,
             max_num_hands=config.MAX_NUM_HANDS,
+            model_complexity=config.HAND_MODEL_COMPLEXITY,
             min_detection_confidence=config.MIN_DETECTION_CONFIDENCE,
             min_tracking_confidence=config.MIN_TRACKING_CONFIDENCE
         )
         
-        # Initialize YOLO phone detection model
-        self.phone_model = YOLO(config.PHONE_MODEL_PATH)
+        # Initialize YOLO phone detection model (INT8 runs from a pre-quantized export)
+        if precision == 'int8':
+            model_path = config.PHONE_MODEL_INT8_PATH
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(
+                    f"INT8 model not found: {model_path} "
+                    "(export with: yolo export model=models/best.pt format=engine int8=True data=<dataset.yaml> dynamic=True batch=8)"
+                )
+            self.phone_model = YOLO(model_path, task='detect')
+        else:
+            self.phone_model = YOLO(config.PHONE_MODEL_PATH)
         
-        # Initialize tracking variables
-        self.phone_positions = []  # Track phone positions over time
-        self.active_usage_history = []  # Track active usage over time
+        # Per-frame config values, read once (CLI overrides are applied before construction)
+        self._predict_args = {
+            'conf': config.PHONE_CONFIDENCE_THRESHOLD,
+            'device': config.DEVICE,
+            'half': precision == 'fp16',
+            'verbose': False,  # Skip Ultralytics' per-call log line
+        }
+        self._dist_thresh_sq = config.PHONE_HAND_DISTANCE_THRESHOLD_SQ
+        self._max_inactive = config.MAX_INACTIVE_FRAMES
         
-        # Timer tracking for phone holding
-        self.phone_hold_start_time = None
-        self.phone_hold_duration = 0.0
-        self.current_phone_timer = 0.0
-        self.is_phone_being_held = False
+        # Compiled proximity kernel (optional), compiled up front rather than on the first frame
+        self._use_numba = config.USE_NUMBA and utils_numba.NUMBA_AVAILABLE
+        if self._use_numba:
+            utils_numba.warmup()
+        
+        # Reusable RGB buffer for MediaPipe input
+        self._rgb_buf = None
+        
+        # Worker thread for running hand detection alongside YOLO
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        
+        # Frame size of the current video, set by the video processor (None = read from frame)
+        self.frame_w = None
+        self.frame_h = None
+        
+        # Initialize tracking variables (and the phone hold timer)
+        self._max_history = max(config.MIN_MOTION_FRAMES, config.MAX_INACTIVE_FRAMES) * 2
+        self.reset_tracking()
         
     def detect_devices(self, frame):
         """Detect phones and tap-to-pay devices in the frame using YOLO"""
-        results = self.phone_model(frame, conf=config.PHONE_CONFIDENCE_THRESHOLD)
-        phones = []
-        tap_to_pay_devices = []
-        
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    # Get class ID and confidence
-                    class_id = int(box.cls[0].cpu().numpy())
-                    confidence = box.conf[0].cpu().numpy()
-                    
-                    # Get bounding box coordinates
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    
-                    device_info = {
-                        'bbox': [x1, y1, x2, y2],
-                        'confidence': confidence,
-                        'center': utils.get_phone_center([x1, y1, x2, y2]),
-                        'class_id': class_id
-                    }
-                    
-                    if class_id == config.CLASS_PHONE:
-                        phones.append(device_info)
-                    elif class_id == config.CLASS_TAP_TO_PAY:
-                        tap_to_pay_devices.append(device_info)
+        results = self.phone_model(frame, **self._predict_args)
+        return self._extract_devices(results[0].boxes)
+    
+    def _extract_devices(self, boxes):
+        """Split YOLO boxes into phones and tap-to-pay devices"""
+        if boxes is None or len(boxes) == 0:
+            return [], []
+        
+        # Pull each tensor to the CPU once instead of once per box
+        class_ids = boxes.cls.cpu().numpy().astype(np.int32)
+        confidences = boxes.conf.cpu().numpy()
+        xyxy = boxes.xyxy.cpu().numpy()
+        centers = (xyxy[:, :2] + xyxy[:, 2:]) * 0.5
+        
+        def build(mask):
+            return [
+                {
+                    'bbox': bbox,
+                    'confidence': confidence,
+                    'center': tuple(center),
+                    'class_id': class_id
+                }
+                for bbox, confidence, center, class_id in zip(
+                    xyxy[mask].tolist(), confidences[mask].tolist(),
+                    centers[mask].tolist(), class_ids[mask].tolist()
+                )
+            ]
+        
+        phones = build(class_ids == config.CLASS_PHONE)
+        tap_to_pay_devices = build(class_ids == config.CLASS_TAP_TO_PAY)
         
         return phones, tap_to_pay_devices
     
     def detect_hands(self, frame):
         """Detect hands in the frame using MediaPipe"""
-        # Convert BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.hands.process(rgb_frame)
+        # Convert BGR to RGB into a reused buffer to avoid a per-frame allocation
+        if self._rgb_buf is None or self._rgb_buf.shape != frame.shape:
+            self._rgb_buf = np.empty_like(frame)
+        self._rgb_buf.flags.writeable = True
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+        self._rgb_buf.flags.writeable = False
+        results = self.hands.process(self._rgb_buf)
         
         hands = []
         if results.multi_hand_landmarks:
+            width, height = self.frame_w, self.frame_h
+            if width is None or height is None:
+                height, width = frame.shape[:2]
             for hand_landmarks in results.multi_hand_landmarks:
-                hand_center = utils.get_hand_center(hand_landmarks)
+                hand_center = utils.get_hand_center(hand_landmarks, width, height)
                 hands.append({
                     'landmarks': hand_landmarks,
                     'center': hand_center
@@ -84,115 +133,127 @@ class HandPhoneAnalyzer:
         
         return hands
     
-    def analyze_phone_hand_interaction(self, phones, hands, frame_shape):
-        """Analyze interaction between phones and hands"""
-        active_phones = []
+    def _analyze_devices(self, devices, hand_centers):
+        """Mark each device as held if any hand center is within the distance threshold
         
-        for phone in phones:
-            phone_center = phone['center']
-            is_being_held = False
-            
-            # Check if any hand is close to the phone (holding/touching)
-            for hand in hands:
-                hand_center = hand['center']
-                if utils.is_phone_hand_close(phone_center, hand_center, frame_shape):
-                    is_being_held = True
-                    break
-            
-            phone['is_being_held'] = is_being_held
-            phone['is_active'] = is_being_held  # Only phones being held are considered active
-            active_phones.append(phone)
+        hand_centers is an (M, 2) float32 array of hand centers in pixels, or None if no hands.
+        """
+        if not devices:
+            return devices
         
-        return active_phones
-    
-    def analyze_tap_to_pay_hand_interaction(self, tap_to_pay_devices, hands, frame_shape):
-        """Analyze interaction between tap-to-pay devices and hands"""
-        active_devices = []
+        if hand_centers is None:
+            held = [False] * len(devices)
+        else:
+            device_centers = np.asarray([device['center'] for device in devices], dtype=np.float32)
+            if self._use_numba:
+                mask = utils_numba.close_mask(device_centers, hand_centers, float(self._dist_thresh_sq))
+            else:
+                mask = utils.pairwise_close(device_centers, hand_centers, self._dist_thresh_sq)
+            held = mask.any(axis=1).tolist()
         
-        for device in tap_to_pay_devices:
-            device_center = device['center']
-            is_being_held = False
-            
-            # Check if any hand is close to the tap-to-pay device
-            for hand in hands:
-                hand_center = hand['center']
-                if utils.is_phone_hand_close(device_center, hand_center, frame_shape):
-                    is_being_held = True
-                    break
-            
+        for device, is_being_held in zip(devices, held):
             device['is_being_held'] = is_being_held
-            device['is_active'] = is_being_held
-            active_devices.append(device)
+            device['is_active'] = is_being_held  # Only devices being held are considered active
         
-        return active_devices
+        return devices
     
-    def update_phone_timer(self, phones, fps):
-        """Update timer for phone holding duration"""
-        phone_currently_held = any(phone.get('is_being_held', False) for phone in phones)
-        current_time = time.time()
+    def update_phone_timer(self, phones, frame_idx, fps):
+        """Update timer for phone holding duration
+        
+        Durations are measured in video time (frames / fps), not processing time.
+        """
+        # Idle frame with no hold in progress: nothing to update
+        if not phones and not self.is_phone_being_held:
+            return
+        
+        phone_currently_held = any(phone['is_being_held'] for phone in phones)
         
         if phone_currently_held:
             if not self.is_phone_being_held:
                 # Phone just started being held
-                self.phone_hold_start_time = current_time
+                self.phone_hold_start_frame = frame_idx
                 self.is_phone_being_held = True
                 self.current_phone_timer = 0.0
             else:
                 # Phone continues to be held
-                self.current_phone_timer = current_time - self.phone_hold_start_time
+                self.current_phone_timer = (frame_idx - self.phone_hold_start_frame) / fps
         else:
             if self.is_phone_being_held:
                 # Phone was just released
                 self.phone_hold_duration += self.current_phone_timer
                 self.is_phone_being_held = False
                 self.current_phone_timer = 0.0
-                self.phone_hold_start_time = None
+                self.phone_hold_start_frame = None
     
     def get_phone_hold_duration(self):
         """Get current phone holding duration"""
-        if self.is_phone_being_held and self.phone_hold_start_time:
+        if self.is_phone_being_held and self.phone_hold_start_frame is not None:
             return self.current_phone_timer
         return 0.0
     
     def get_total_phone_hold_duration(self):
         """Get total accumulated phone holding duration"""
         total = self.phone_hold_duration
-        if self.is_phone_being_held and self.phone_hold_start_time:
+        if self.is_phone_being_held and self.phone_hold_start_frame is not None:
             total += self.current_phone_timer
         return total
     
+    def reset_tracking(self, expected_frames=1024):
+        """Reset per-video tracking and hold-timer state, preallocating for about expected_frames"""
+        capacity = max(int(expected_frames), 1)
+        self.active_arr = np.zeros(capacity, dtype=np.uint8)  # Active usage per frame
+        self.positions_arr = np.full((capacity, 2), np.nan, dtype=np.float32)  # Phone position per frame
+        self._tracked_frames = 0
+        self._active_count = 0
+        
+        # Timer tracking for phone holding, in frames of the current video
+        self.phone_hold_start_frame = None
+        self.phone_hold_duration = 0.0
+        self.current_phone_timer = 0.0
+        self.is_phone_being_held = False
+    
+    def _ensure_capacity(self, frame_idx):
+        """Grow the tracking arrays if frame_idx is past their end"""
+        capacity = len(self.active_arr)
+        if frame_idx < capacity:
+            return
+        
+        new_capacity = max(capacity * 2, frame_idx + 1)
+        active_arr = np.zeros(new_capacity, dtype=np.uint8)
+        active_arr[:capacity] = self.active_arr
+        positions_arr = np.full((new_capacity, 2), np.nan, dtype=np.float32)
+        positions_arr[:capacity] = self.positions_arr
+        self.active_arr = active_arr
+        self.positions_arr = positions_arr
+    
     def update_tracking(self, phones, frame_idx):
         """Update tracking variables for temporal analysis"""
-        # Update phone positions
+        self._ensure_capacity(frame_idx)
+        
+        # Update phone positions (frames without a phone stay NaN)
         if phones:
             # Use the first phone's position (assuming single phone scenario)
-            self.phone_positions.append(phones[0]['center'])
-        else:
-            self.phone_positions.append(None)
+            self.positions_arr[frame_idx] = phones[0]['center']
         
-        # Keep only recent history
-        max_history = max(config.MIN_MOTION_FRAMES, config.MAX_INACTIVE_FRAMES) * 2
-        if len(self.phone_positions) > max_history:
-            self.phone_positions = self.phone_positions[-max_history:]
-        
-        # Update active usage history (only for phones being held)
+        # Update active usage (only for phones being held)
         is_active = any(phone.get('is_being_held', False) for phone in phones)
-        self.active_usage_history.append(is_active)
-        
-        # Keep only recent history
-        if len(self.active_usage_history) > max_history:
-            self.active_usage_history = self.active_usage_history[-max_history:]
+        self.active_arr[frame_idx] = is_active
+        self._active_count += is_active
+        self._tracked_frames = max(self._tracked_frames, frame_idx + 1)
     
     def apply_temporal_filtering(self, phones):
         """Apply temporal filtering to reduce false positives"""
-        if not self.active_usage_history:
+        if not self._tracked_frames:
             return phones
         
         # Disable aggressive temporal filtering - trust the hand detection
         # Only apply temporal filtering if we have a very long history with no activity
-        if len(self.active_usage_history) >= config.MAX_INACTIVE_FRAMES * 3:  # 3x longer history required
-            recent_active = self.active_usage_history[-config.MAX_INACTIVE_FRAMES * 2:]  # Check longer period
-            recent_activity_rate = sum(recent_active) / len(recent_active)
+        # History length is capped at the old rolling-window size to keep the same behavior
+        history_len = min(self._tracked_frames, self._max_history)
+        if history_len >= self._max_inactive * 3:  # 3x longer history required
+            window = min(self._max_inactive * 2, history_len)  # Check longer period
+            recent_active = self.active_arr[self._tracked_frames - window:self._tracked_frames]
+            recent_activity_rate = recent_active.sum() / window
             
             # Only mark as inactive if NO activity for extended period AND no current hand detection
             if recent_activity_rate == 0.0 and not any(phone.get('is_being_held', False) for phone in phones):
@@ -205,18 +266,53 @@ class HandPhoneAnalyzer:
     
     def process_frame(self, frame, frame_idx, fps=30):
         """Process a single frame for device usage detection"""
+        # Detect hands on the worker thread while YOLO runs here; both release the GIL
+        hands_future = self._pool.submit(self.detect_hands, frame)
+        
         # Detect phones and tap-to-pay devices
         phones, tap_to_pay_devices = self.detect_devices(frame)
+        hands = hands_future.result()
+        
+        return self._process_detections(frame_idx, fps, phones, tap_to_pay_devices, hands)
+    
+    def process_batch(self, frames, start_idx, fps=30):
+        """Process consecutive frames with a single batched YOLO call
         
-        # Detect hands
-        hands = self.detect_hands(frame)
+        Returns a list of (phones, tap_to_pay_devices, hands, phone_hold_time) tuples, one per frame.
+        """
+        if not frames:
+            return []
+        
+        # Hand tracking is sequential, so the worker handles the frames in order
+        hands_future = self._pool.submit(lambda: [self.detect_hands(frame) for frame in frames])
+        
+        results = self.phone_model(list(frames), **self._predict_args)
+        hands_per_frame = hands_future.result()
+        
+        outputs = []
+        for offset, (result, hands) in enumerate(zip(results, hands_per_frame)):
+            phones, tap_to_pay_devices = self._extract_devices(result.boxes)
+            outputs.append(
+                self._process_detections(start_idx + offset, fps, phones, tap_to_pay_devices, hands)
+            )
+        
+        return outputs
+    
+    def _process_detections(self, frame_idx, fps, phones, tap_to_pay_devices, hands):
+        """Run the per-frame analysis on detected devices and hands
         
-        # Analyze interactions
-        phones = self.analyze_phone_hand_interaction(phones, hands, frame.shape)
-        tap_to_pay_devices = self.analyze_tap_to_pay_hand_interaction(tap_to_pay_devices, hands, frame.shape)
+        Returns (phones, tap_to_pay_devices, hands, phone_hold_time), with the hold
+        timer captured as of this frame.
+        """
+        # Analyze interactions, sharing one array of hand centers (pixels) between device types
+        hand_centers = None
+        if hands:
+            hand_centers = np.asarray([hand['center'] for hand in hands], dtype=np.float32)
+        phones = self._analyze_devices(phones, hand_centers)
+        tap_to_pay_devices = self._analyze_devices(tap_to_pay_devices, hand_centers)
         
         # Update phone timer
-        self.update_phone_timer(phones, fps)
+        self.update_phone_timer(phones, frame_idx, fps)
         
         # Update tracking
         self.update_tracking(phones, frame_idx)
@@ -224,11 +320,11 @@ class HandPhoneAnalyzer:
         # Apply temporal filtering
         phones = self.apply_temporal_filtering(phones)
         
-        return phones, tap_to_pay_devices, hands
+        return phones, tap_to_pay_devices, hands, self.get_phone_hold_duration()
     
     def get_usage_statistics(self):
         """Get usage statistics from tracking history"""
-        if not self.active_usage_history:
+        if not self._tracked_frames:
             return {
                 'total_frames': 0,
                 'active_frames': 0,
@@ -237,8 +333,8 @@ class HandPhoneAnalyzer:
                 'current_phone_hold_time': 0.0
             }
         
-        total_frames = len(self.active_usage_history)
-        active_frames = sum(self.active_usage_history)
+        total_frames = self._tracked_frames
+        active_frames = self._active_count
         usage_percentage = (active_frames / total_frames) * 100
         
         return {
@@ -251,4 +347,5 @@ class HandPhoneAnalyzer:
     
     def cleanup(self):
         """Clean up resources"""
+        self._pool.shutdown()
         self.hands.close()
\ No newline at end of file
@@ -8,7 +8,6 @@ import argparse
 import os
 import sys
 import time
-from video_processor import VideoProcessor
 import config
 
 def main():
@@ -66,6 +65,13 @@ def main():
         help="Show hand landmarks in output video (for debugging)"
     )
     
+    parser.add_argument(
+        "--precision",
+        choices=["fp32", "fp16", "int8"],
+        default=config.PRECISION,
+        help=f"Phone detector precision (default: {config.PRECISION})"
+    )
+    
     args = parser.parse_args()
     
     # Validate input file
@@ -90,9 +96,18 @@ def main():
     config.PHONE_CONFIDENCE_THRESHOLD = args.phone_conf
     config.HAND_CONFIDENCE_THRESHOLD = args.hand_conf
     config.PHONE_HAND_DISTANCE_THRESHOLD = args.distance_threshold
+    config.PHONE_HAND_DISTANCE_THRESHOLD_SQ = args.distance_threshold ** 2
+    config.PRECISION = args.precision
+    
+    # Validate the INT8 model before any models are loaded
+    if config.PRECISION == "int8" and not os.path.exists(config.PHONE_MODEL_INT8_PATH):
+        print(f"Error: INT8 model '{config.PHONE_MODEL_INT8_PATH}' does not exist.")
+        print("Export one with: yolo export model=models/best.pt format=engine int8=True "
+              "data=<dataset.yaml> dynamic=True batch=8")
+        sys.exit(1)
     
     if args.show_hands:
-        config.MAX_NUM_HANDS = 2  # Enable hand visualization
+        config.DRAW_HAND_LANDMARKS = True  # Enable hand visualization
     
     # Print configuration
     print("Phone Usage Detection System")
@@ -101,18 +116,21 @@ def main():
     print(f"Phone confidence threshold: {config.PHONE_CONFIDENCE_THRESHOLD}")
     print(f"Hand confidence threshold: {config.HAND_CONFIDENCE_THRESHOLD}")
     print(f"Phone-hand distance threshold: {config.PHONE_HAND_DISTANCE_THRESHOLD} pixels")
+    print(f"Detector precision: {config.PRECISION}")
     print(f"Preserve audio: {config.PRESERVE_AUDIO}")
     print(f"Generate report: {config.GENERATE_REPORT}")
     print("=" * 40)
     
     # Initialize video processor
+    # Imported here so --help and argument errors don't pay for loading cv2/mediapipe/torch
+    from video_processor import VideoProcessor
     processor = VideoProcessor()
     
     try:
         # Process video
-        start_time = time.time()
+        start_time = time.perf_counter()
         output_path = processor.process_video(args.input_video, args.output)
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         
         print("\n" + "=" * 40)
         print("PROCESSING COMPLETED")
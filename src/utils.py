@@ -3,6 +3,7 @@ Utility functions for phone usage detection
 """
 
 import cv2
+import math
 import numpy as np
 import os
 import json
@@ -11,43 +12,44 @@ import config
 
 def calculate_distance(point1, point2):
     """Calculate Euclidean distance between two points"""
-    return np.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
+    return math.hypot(point1[0] - point2[0], point1[1] - point2[1])
 
-def get_phone_center(bbox):
-    """Get center point of phone bounding box"""
-    x1, y1, x2, y2 = bbox
-    return ((x1 + x2) / 2, (y1 + y2) / 2)
-
-def get_hand_center(hand_landmarks):
-    """Get center point of hand using palm landmarks"""
-    # Use palm center (landmark 9) as hand center
+def get_hand_center(hand_landmarks, width, height):
+    """Get center point of hand in pixel coordinates using palm landmarks"""
+    # Use palm center (landmark 9) as hand center, converted from normalized (0-1)
     palm_center = hand_landmarks.landmark[9]
-    return (palm_center.x, palm_center.y)
+    return (palm_center.x * width, palm_center.y * height)
 
-def is_phone_hand_close(phone_center, hand_center, frame_shape):
+def is_phone_hand_close(phone_center, hand_center):
     """Check if phone and hand are close enough for active usage"""
-    # Phone center is already in pixel coordinates
-    # Hand center is in normalized coordinates (0-1), need to convert to pixels
-    h, w = frame_shape[:2]
-    phone_pixel = phone_center  # Already in pixels
-    hand_pixel = (hand_center[0] * w, hand_center[1] * h)  # Convert normalized to pixels
-    
-    distance = calculate_distance(phone_pixel, hand_pixel)
-    return distance <= config.PHONE_HAND_DISTANCE_THRESHOLD
+    # Both centers are in pixel coordinates
+    dx = phone_center[0] - hand_center[0]
+    dy = phone_center[1] - hand_center[1]
+    
+    # Compare squared distances, no sqrt needed for a threshold check
+    return dx * dx + dy * dy <= config.PHONE_HAND_DISTANCE_THRESHOLD_SQ
+
+def pairwise_close(centers_a, centers_b, threshold_sq):
+    """Check every pair of (N, 2) and (M, 2) pixel centers against a squared distance threshold
+
+    Returns an (N, M) boolean mask, comparing squared distances to avoid the sqrt.
+    """
+    diff = centers_a[:, None, :] - centers_b[None, :, :]
+    dist_sq = np.einsum('ijk,ijk->ij', diff, diff)
+    return dist_sq <= threshold_sq
 
 def detect_motion(phone_positions, frame_idx):
-    """Detect if phone is moving based on position history"""
-    if len(phone_positions) < config.MIN_MOTION_FRAMES:
-        return False
+    """Detect if phone is moving based on position history
     
-    # Calculate average movement over recent frames
-    recent_positions = phone_positions[-config.MIN_MOTION_FRAMES:]
-    total_movement = 0
+    phone_positions is an (N, 2) array indexed by frame, with NaN where no phone was seen.
+    """
+    if frame_idx + 1 < config.MIN_MOTION_FRAMES:
+        return False
     
-    for i in range(1, len(recent_positions)):
-        if recent_positions[i] and recent_positions[i-1]:
-            movement = calculate_distance(recent_positions[i], recent_positions[i-1])
-            total_movement += movement
+    # Calculate average movement over recent frames, skipping steps with a missing position
+    recent_positions = phone_positions[frame_idx + 1 - config.MIN_MOTION_FRAMES:frame_idx + 1]
+    steps = np.diff(recent_positions, axis=0)
+    total_movement = np.nansum(np.hypot(steps[:, 0], steps[:, 1]))
     
     avg_movement = total_movement / (len(recent_positions) - 1)
     return avg_movement > config.MOTION_THRESHOLD
@@ -57,39 +59,45 @@ def create_output_directory():
     os.makedirs(config.OUTPUT_DIR, exist_ok=True)
     return config.OUTPUT_DIR
 
-def save_report(usage_data, video_path, output_path):
-    """Save phone usage report to JSON file"""
-    # Convert numpy types to native Python types for JSON serialization
-    def convert_numpy_types(obj):
-        if isinstance(obj, np.integer):
-            return int(obj)
-        elif isinstance(obj, np.floating):
-            return float(obj)
-        elif isinstance(obj, np.ndarray):
-            return obj.tolist()
-        elif isinstance(obj, dict):
-            return {key: convert_numpy_types(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            return [convert_numpy_types(item) for item in obj]
-        return obj
-    
-    # Convert usage data to JSON-serializable format
-    serializable_usage_data = convert_numpy_types(usage_data)
+def json_default(obj):
+    """Convert numpy types to native Python types for JSON serialization"""
+    if isinstance(obj, np.integer):
+        return int(obj)
+    elif isinstance(obj, np.floating):
+        return float(obj)
+    elif isinstance(obj, (np.ndarray, np.bool_)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def save_report(frame_log_path, video_path, output_path, total_frames, active_frames, tap_to_pay_frames):
+    """Save phone usage report to JSON file
     
+    Per-frame details are streamed from frame_log_path (one JSON object per line)
+    into the report's frame_details list, so they never have to be held in memory.
+    """
     report = {
         "video_path": video_path,
         "output_path": output_path,
         "processing_time": datetime.now().isoformat(),
-        "total_frames": len(usage_data),
-        "active_phone_usage_frames": sum(1 for frame in usage_data if frame.get("active_phone_usage", False)),
-        "tap_to_pay_usage_frames": sum(1 for frame in usage_data if frame.get("tap_to_pay_usage", False)),
-        "phone_usage_percentage": float((sum(1 for frame in usage_data if frame.get("active_phone_usage", False)) / len(usage_data)) * 100),
-        "frame_details": serializable_usage_data
+        "total_frames": total_frames,
+        "active_phone_usage_frames": active_frames,
+        "tap_to_pay_usage_frames": tap_to_pay_frames,
+        "phone_usage_percentage": (active_frames / total_frames) * 100 if total_frames else 0.0
     }
     
     report_path = os.path.join(config.OUTPUT_DIR, config.REPORT_FILE)
-    with open(report_path, 'w') as f:
-        json.dump(report, f, indent=2)
+    with open(report_path, 'w') as f, open(frame_log_path) as frame_log:
+        # Write the summary fields, then the frame_details list
+        f.write('{')
+        for key, value in report.items():
+            f.write(f'\n  {json.dumps(key)}: {json.dumps(value, default=json_default)},')
+        f.write('\n  "frame_details": [')
+        separator = '\n    '
+        for line in frame_log:
+            f.write(separator)
+            f.write(line.rstrip('\n'))
+            separator = ',\n    '
+        f.write('\n  ]\n}\n')
     
     return report_path
 
@@ -153,9 +161,39 @@ def draw_tap_to_pay_box(frame, bbox, confidence, is_active, label="TAP TO PAY"):
     
     return frame
 
+def open_video_capture(video_path):
+    """Open a video, preferring hardware-accelerated decoding when available"""
+    if config.HW_DECODE:
+        hw_params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        if config.HW_DECODE_DEVICE is not None:
+            hw_params += [cv2.CAP_PROP_HW_DEVICE, config.HW_DECODE_DEVICE]
+        
+        # OpenCV's FFmpeg backend reads these options on every open, so set them for this open only
+        previous_options = os.environ.get("OPENCV_FFMPEG_CAPTURE_OPTIONS")
+        if config.HW_DECODE_FFMPEG_OPTIONS:
+            os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = config.HW_DECODE_FFMPEG_OPTIONS
+        try:
+            cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, hw_params)
+        finally:
+            if previous_options is None:
+                os.environ.pop("OPENCV_FFMPEG_CAPTURE_OPTIONS", None)
+            else:
+                os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = previous_options
+        
+        # Some hardware paths open fine but return empty frames, so probe one frame, then rewind
+        if cap.isOpened():
+            ret, frame = cap.read()
+            if ret and frame is not None and cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                return cap
+        cap.release()
+    
+    # Fall back to software decoding
+    return cv2.VideoCapture(video_path, cv2.CAP_ANY,
+                            [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_NONE])
+
 def get_video_info(video_path):
     """Get video information (fps, frame count, resolution)"""
-    cap = cv2.VideoCapture(video_path)
+    cap = open_video_capture(video_path)
     fps = cap.get(cv2.CAP_PROP_FPS)
     frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
@@ -0,0 +1,29 @@
+"""
+Numba-compiled kernels for phone usage detection
+Numba is optional; check NUMBA_AVAILABLE before calling these kernels
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def close_mask(centers_a, centers_b, threshold_sq):
+        """Return an (N, M) mask of center pairs within a squared distance threshold"""
+        out = np.zeros((centers_a.shape[0], centers_b.shape[0]), np.bool_)
+        for i in range(centers_a.shape[0]):
+            for j in range(centers_b.shape[0]):
+                dx = centers_a[i, 0] - centers_b[j, 0]
+                dy = centers_a[i, 1] - centers_b[j, 1]
+                out[i, j] = dx * dx + dy * dy <= threshold_sq
+        return out
+
+    def warmup():
+        """Compile close_mask for float32 centers so the first frame doesn't pay for it"""
+        centers = np.zeros((1, 2), dtype=np.float32)
+        close_mask(centers, centers, 1.0)
@@ -4,21 +4,122 @@ Handles video input/output with audio preservation and annotation
 """
 
 import cv2
+import json
+import numpy as np
 import os
+import queue
+import shutil
+import subprocess
+import threading
 import time
-from moviepy.editor import VideoFileClip, AudioFileClip
+from functools import lru_cache
+from moviepy.editor import VideoFileClip
 import config
 import utils
 from hand_phone_analyzer import HandPhoneAnalyzer
 
+class FFmpegWriter:
+    """Pipe raw BGR frames into an FFmpeg encoder, optionally muxing audio from a source file"""
+    
+    def __init__(self, output_path, fps, width, height, audio_source=None):
+        cmd = [
+            config.FFMPEG_PATH, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', str(fps),
+            '-i', '-'
+        ]
+        if audio_source is not None:
+            cmd += ['-i', audio_source, '-map', '0:v', '-map', '1:a?', '-c:a', 'copy', '-shortest']
+        if self.encoder_available(config.FFMPEG_PATH, config.VIDEO_ENCODER):
+            cmd += ['-c:v', config.VIDEO_ENCODER, *config.VIDEO_ENCODER_ARGS]
+        else:
+            print(f"FFmpeg encoder {config.VIDEO_ENCODER} unavailable, using {config.FALLBACK_VIDEO_ENCODER}")
+            cmd += ['-c:v', config.FALLBACK_VIDEO_ENCODER, *config.FALLBACK_VIDEO_ENCODER_ARGS]
+        cmd += ['-pix_fmt', 'yuv420p', output_path]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def encoder_available(ffmpeg, encoder):
+        """Check that FFmpeg lists the encoder and can open it (hardware encoders need a device)"""
+        try:
+            listed = subprocess.run(
+                [ffmpeg, '-hide_banner', '-encoders'], capture_output=True, text=True, check=True
+            ).stdout
+            if not any(line.split()[1:2] == [encoder] for line in listed.splitlines()):
+                return False
+            # Encode one blank frame to make sure the encoder actually initializes
+            subprocess.run(
+                [ffmpeg, '-hide_banner', '-loglevel', 'error', '-f', 'lavfi', '-i', 'color=size=256x256',
+                 '-frames:v', '1', '-c:v', encoder, '-f', 'null', '-'],
+                capture_output=True, check=True
+            )
+        except (OSError, subprocess.CalledProcessError):
+            return False
+        return True
+    
+    def write(self, frame):
+        """Write one BGR frame"""
+        self.proc.stdin.write(frame.tobytes())
+    
+    def release(self):
+        """Finish encoding and wait for FFmpeg to exit, raising if it failed"""
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass  # FFmpeg already exited; its return code says why
+        if self.proc.wait() != 0:
+            raise RuntimeError(f"FFmpeg exited with code {self.proc.returncode}")
+
+class PyAVCapture:
+    """Minimal cv2.VideoCapture stand-in that decodes with PyAV, optionally on a hardware device"""
+    
+    def __init__(self, video_path, hwaccel=None):
+        import av
+        options = {}
+        if hwaccel:
+            from av.codec.hwaccel import HWAccel
+            options['hwaccel'] = HWAccel(device_type=hwaccel, allow_software_fallback=True)
+        self.container = av.open(video_path, **options)
+        self._frames = self.container.decode(video=0)
+    
+    def isOpened(self):
+        return True
+    
+    def read(self, buffer=None):
+        """Return (ret, frame) like cv2; frames are new BGR arrays, so buffer is ignored"""
+        try:
+            frame = next(self._frames)
+        except StopIteration:
+            return False, None
+        return True, frame.to_ndarray(format='bgr24')
+    
+    def release(self):
+        self.container.close()
+
 class VideoProcessor:
+    # Scalar per-frame usage fields kept as columns (struct-of-arrays)
+    USAGE_COLUMNS = {
+        'active_phone_usage': np.bool_,
+        'tap_to_pay_usage': np.bool_,
+        'phones_detected': np.int32,
+        'tap_to_pay_detected': np.int32,
+        'hands_detected': np.int32,
+    }
+    
     def __init__(self):
         """Initialize the video processor"""
-        self.analyzer = HandPhoneAnalyzer()
-        self.usage_data = []  # Store usage data for each frame
+        self.analyzer = HandPhoneAnalyzer(precision=config.PRECISION)
+        self._reset_usage_columns(0, 30)
         
-    def process_video(self, input_path, output_path=None):
-        """Process video for phone usage detection"""
+    def process_video(self, input_path, output_path=None, prefetch=8, write_queue_size=16):
+        """Process video for phone usage detection
+        
+        Runs as a four-stage pipeline: decode, annotate and encode on background threads,
+        detection/analysis on the calling thread. Up to `prefetch` frames are queued for
+        detection and for annotation, and `write_queue_size` for encoding; a full queue
+        blocks its producer (backpressure). Each stage is a single thread reading a FIFO
+        queue, so frames stay in order without a reorder buffer.
+        """
         print(f"Processing video: {input_path}")
         
         # Get video information
@@ -34,7 +135,10 @@ class VideoProcessor:
         utils.create_output_directory()
         
         # Open video capture
-        cap = cv2.VideoCapture(input_path)
+        if config.VIDEO_DECODER == "pyav":
+            cap = PyAVCapture(input_path, config.PYAV_HWACCEL)
+        else:
+            cap = utils.open_video_capture(input_path)
         
         # Get video properties
         fps = video_info['fps']
@@ -42,82 +146,64 @@ class VideoProcessor:
         height = video_info['height']
         total_frames = video_info['frame_count']
         
-        # Initialize video writer
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        # Settings read once per video rather than per frame
+        preserve_audio = config.PRESERVE_AUDIO
+        gen_report = config.GENERATE_REPORT
         
-        # Process frames
-        frame_idx = 0
-        start_time = time.time()
+        # Size the per-frame usage columns and the analyzer's tracking arrays for this video
+        self._reset_usage_columns(total_frames, fps)
+        self.analyzer.reset_tracking(total_frames)
+        self.analyzer.frame_w, self.analyzer.frame_h = width, height
         
-        print("Starting frame processing...")
+        # Initialize video writer (FFmpeg muxes the original audio in the same pass)
+        use_ffmpeg = shutil.which(config.FFMPEG_PATH) is not None
+        if use_ffmpeg:
+            audio_source = input_path if preserve_audio else None
+            out = FFmpegWriter(output_path, fps, width, height, audio_source)
+        else:
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Process frame
-            phones, tap_to_pay_devices, hands = self.analyzer.process_frame(frame, frame_idx, fps)
-            
-            # Store usage data
-            frame_data = {
-                "frame_idx": frame_idx,
-                "timestamp": frame_idx / fps,
-                "phones_detected": len(phones),
-                "tap_to_pay_detected": len(tap_to_pay_devices),
-                "hands_detected": len(hands),
-                "active_phone_usage": any(phone.get('is_being_held', False) for phone in phones),
-                "tap_to_pay_usage": any(device.get('is_being_held', False) for device in tap_to_pay_devices),
-                "phone_details": [],
-                "tap_to_pay_details": []
-            }
-            
-            # Draw annotations on frame
-            annotated_frame = self.annotate_frame(frame, phones, tap_to_pay_devices, hands, frame_idx, fps)
-            
-            # Store phone details
-            for phone in phones:
-                frame_data["phone_details"].append({
-                    "bbox": phone['bbox'],
-                    "confidence": phone['confidence'],
-                    "is_being_held": phone.get('is_being_held', False)
-                })
-            
-            # Store tap-to-pay details
-            for device in tap_to_pay_devices:
-                frame_data["tap_to_pay_details"].append({
-                    "bbox": device['bbox'],
-                    "confidence": device['confidence'],
-                    "is_being_held": device.get('is_being_held', False)
-                })
-            
-            self.usage_data.append(frame_data)
+        # Preallocated frame buffers, decoded into and recycled by the writer. One per slot a
+        # frame can occupy: reader, read queue, batch, annotate queue, annotator, write queue, writer.
+        batch_size = max(config.BATCH_SIZE, 1)
+        frame_pool = queue.Queue()
+        for _ in range(2 * prefetch + batch_size + write_queue_size + 3):
+            frame_pool.put(np.empty((height, width, 3), dtype=np.uint8))
+        
+        # Per-frame details for the report are streamed to disk as JSON lines
+        frame_log_path = None
+        frame_log = None
+        if gen_report:
+            frame_log_path = os.path.splitext(output_path)[0] + "_frames.jsonl"
+            frame_log = open(frame_log_path, 'w')
+        
+        try:
+            self._run_pipeline(cap, out, frame_pool, fps, total_frames, batch_size,
+                               prefetch, write_queue_size, frame_log)
             
-            # Write frame
-            out.write(annotated_frame)
+            # Preserve audio if requested and not already muxed by FFmpeg
+            if preserve_audio and not use_ffmpeg:
+                print("Preserving audio...")
+                self.preserve_audio(input_path, output_path)
             
-            # Progress update
-            frame_idx += 1
-            if frame_idx % 100 == 0:
-                elapsed_time = time.time() - start_time
-                fps_processing = frame_idx / elapsed_time
-                print(f"Processed {frame_idx}/{total_frames} frames ({fps_processing:.1f} FPS)")
-        
-        # Cleanup
-        cap.release()
-        out.release()
-        
-        # Preserve audio if requested
-        if config.PRESERVE_AUDIO:
-            print("Preserving audio...")
-            self.preserve_audio(input_path, output_path)
-        
-        # Generate report
-        if config.GENERATE_REPORT:
-            print("Generating report...")
-            report_path = utils.save_report(self.usage_data, input_path, output_path)
-            print(f"Report saved to: {report_path}")
+            # Generate report
+            if gen_report:
+                print("Generating report...")
+                frame_log.close()
+                frames_logged = self.frames_logged
+                report_path = utils.save_report(
+                    frame_log_path, input_path, output_path, frames_logged,
+                    int(np.count_nonzero(self.usage_columns['active_phone_usage'][:frames_logged])),
+                    int(np.count_nonzero(self.usage_columns['tap_to_pay_usage'][:frames_logged]))
+                )
+                print(f"Report saved to: {report_path}")
+        finally:
+            cap.release()
+            # The per-frame log is only an intermediate for the report, whether or not it was written
+            if frame_log is not None:
+                frame_log.close()
+                os.remove(frame_log_path)
         
         # Get final statistics
         stats = self.analyzer.get_usage_statistics()
@@ -130,65 +216,319 @@ class VideoProcessor:
         
         return output_path
     
-    def annotate_frame(self, frame, phones, tap_to_pay_devices, hands, frame_idx, fps):
-        """Annotate frame with bounding boxes and information"""
-        annotated_frame = frame.copy()
-        
-        # Draw phone bounding boxes (only if being held)
-        for phone in phones:
-            if phone.get('is_being_held', False):  # Only show phones being held
-                bbox = phone['bbox']
-                confidence = phone['confidence']
-                
-                annotated_frame = utils.draw_bounding_box(
-                    annotated_frame, bbox, confidence, True, config.CLASS_NAMES[config.CLASS_PHONE]
-                )
+    def _run_pipeline(self, cap, out, frame_pool, fps, total_frames, batch_size,
+                      prefetch, write_queue_size, frame_log=None):
+        """Run the decode/detect/annotate/encode stages until EOF, re-raising any stage error"""
+        # Optionally pin the decode, annotate and encode threads to their own cores
+        if config.PIN_PIPELINE_THREADS and hasattr(os, 'sched_getaffinity'):
+            # Pick from the cores this process may run on (containers often restrict the cpuset)
+            cores = sorted(os.sched_getaffinity(0))
+            reader_core, annotator_core, writer_core = (cores[i % len(cores)] for i in (0, 2, 3))
+        else:
+            reader_core = annotator_core = writer_core = None
+        
+        # Start decode, annotate and encode threads. stop_event aborts every stage; on a normal
+        # run the stages shut down in order via None sentinels instead.
+        read_q = queue.Queue(maxsize=prefetch)
+        annotate_q = queue.Queue(maxsize=prefetch)
+        write_q = queue.Queue(maxsize=write_queue_size)
+        stop_event = threading.Event()
+        self._stage_error = None
+        reader = threading.Thread(
+            target=self._reader_loop, args=(cap, read_q, frame_pool, stop_event, reader_core), daemon=True
+        )
+        annotator = threading.Thread(
+            target=self._annotator_loop, args=(annotate_q, write_q, fps, stop_event, annotator_core), daemon=True
+        )
+        writer = threading.Thread(
+            target=self._writer_loop, args=(out, write_q, frame_pool, stop_event, writer_core), daemon=True
+        )
+        reader.start()
+        annotator.start()
+        writer.start()
         
-        # Draw tap-to-pay device bounding boxes (only if being held)
-        for device in tap_to_pay_devices:
-            if device.get('is_being_held', False):  # Only show tap-to-pay devices being held
-                bbox = device['bbox']
-                confidence = device['confidence']
+        print("Starting frame processing...")
+        
+        try:
+            self._process_frames(read_q, annotate_q, stop_event, fps, total_frames, batch_size, frame_log)
+        except BaseException:
+            stop_event.set()
+            raise
+        finally:
+            # Let the annotator and writer drain (the writer releases the encoder)
+            self._put_unless_stopped(annotate_q, None, stop_event)
+            annotator.join()
+            writer.join()
+            reader.join()
+        
+        # Surface a failure from the decode, annotate or encode thread
+        if self._stage_error is not None:
+            raise self._stage_error
+    
+    def _process_frames(self, read_q, annotate_q, stop_event, fps, total_frames, batch_size, frame_log=None):
+        """Analyze decoded frames in order, handing them and their results to the annotator
+        
+        If frame_log is given, each frame's usage data is written to it as a JSON line.
+        """
+        frame_idx = 0
+        start_time = time.perf_counter()
+        next_report = 100
+        end_of_stream = False
+        
+        while not end_of_stream:
+            # Gather frames so YOLO runs once per batch
+            batch = []
+            buffers = []
+            while len(batch) < batch_size:
+                item = self._get_unless_stopped(read_q, stop_event)
+                if item is None:
+                    end_of_stream = True
+                    break
+                frame, buffer = item
+                batch.append(frame)
+                buffers.append(buffer)
+            
+            if not batch:
+                break
+            
+            # Process batch
+            results = self.analyzer.process_batch(batch, frame_idx, fps)
+            
+            for frame, buffer, (phones, tap_to_pay_devices, hands, hold_time) in zip(batch, buffers, results):
+                held_phones = [phone for phone in phones if phone.get('is_being_held', False)]
+                held_devices = [device for device in tap_to_pay_devices if device.get('is_being_held', False)]
+                
+                # Store usage data
+                frame_data = {
+                    "frame_idx": frame_idx,
+                    "timestamp": frame_idx / fps,
+                    "phones_detected": len(phones),
+                    "tap_to_pay_detected": len(tap_to_pay_devices),
+                    "hands_detected": len(hands),
+                    "active_phone_usage": bool(held_phones),
+                    "tap_to_pay_usage": bool(held_devices)
+                }
+                self._log_usage(frame_idx, frame_data)
                 
-                annotated_frame = utils.draw_tap_to_pay_box(
-                    annotated_frame, bbox, confidence, True, config.CLASS_NAMES[config.CLASS_TAP_TO_PAY]
+                # Per-device details are only needed for the JSON report
+                if frame_log is not None:
+                    frame_data["phone_details"] = [
+                        {"bbox": phone['bbox'], "confidence": phone['confidence'],
+                         "is_being_held": phone.get('is_being_held', False)}
+                        for phone in phones
+                    ]
+                    frame_data["tap_to_pay_details"] = [
+                        {"bbox": device['bbox'], "confidence": device['confidence'],
+                         "is_being_held": device.get('is_being_held', False)}
+                        for device in tap_to_pay_devices
+                    ]
+                    frame_log.write(json.dumps(frame_data, default=utils.json_default))
+                    frame_log.write('\n')
+                
+                # Queue frame for annotation, with the hold timer as of this frame
+                item = (frame, buffer, held_phones, held_devices, hands, frame_idx,
+                        len(phones), len(tap_to_pay_devices), hold_time)
+                if not self._put_unless_stopped(annotate_q, item, stop_event):
+                    return  # Another stage failed; process_video raises its error
+                
+                # Progress update
+                frame_idx += 1
+                if frame_idx >= next_report:
+                    next_report += 100
+                    elapsed_time = time.perf_counter() - start_time
+                    fps_processing = frame_idx / elapsed_time
+                    print(f"Processed {frame_idx}/{total_frames} frames ({fps_processing:.1f} FPS)")
+    
+    def _reader_loop(self, cap, read_q, frame_pool, stop_event, core=None):
+        """Decode frames into pooled buffers and queue them until EOF or until processing stops
+        
+        Queued items are (frame, buffer); frame is normally the buffer itself, but OpenCV
+        returns a new array if the buffer doesn't match the decoded size.
+        """
+        try:
+            self._pin_current_thread(core)
+            while not stop_event.is_set():
+                buffer = self._get_unless_stopped(frame_pool, stop_event)
+                if buffer is None:
+                    return
+                ret, frame = cap.read(buffer)
+                if not ret:
+                    break
+                if not self._put_unless_stopped(read_q, (frame, buffer), stop_event):
+                    return
+        except Exception as e:
+            self._fail_stage(e, stop_event)
+        finally:
+            self._put_unless_stopped(read_q, None, stop_event)
+    
+    def _annotator_loop(self, annotate_q, write_q, fps, stop_event, core=None):
+        """Annotate analyzed frames from annotate_q and pass them to the writer
+        
+        Forwards the None sentinel to the writer on exit.
+        """
+        try:
+            self._pin_current_thread(core)
+            while True:
+                item = self._get_unless_stopped(annotate_q, stop_event)
+                if item is None:
+                    break
+                frame, buffer, held_phones, held_devices, hands, frame_idx, n_phones, n_devices, hold_time = item
+                annotated_frame = self.annotate_frame(
+                    frame, held_phones, held_devices, hands, frame_idx, fps,
+                    n_phones, n_devices, hold_time
                 )
+                if not self._put_unless_stopped(write_q, (annotated_frame, buffer), stop_event):
+                    break
+        except Exception as e:
+            self._fail_stage(e, stop_event)
+        finally:
+            self._put_unless_stopped(write_q, None, stop_event)
+    
+    def _writer_loop(self, out, write_q, frame_pool, stop_event, core=None):
+        """Encode (frame, buffer) items from write_q until the None sentinel, recycling buffers
+        
+        Releases the writer on exit, so encoder errors at finalization are reported too.
+        """
+        try:
+            self._pin_current_thread(core)
+            while True:
+                item = self._get_unless_stopped(write_q, stop_event)
+                if item is None:
+                    break
+                frame, buffer = item
+                out.write(frame)
+                frame_pool.put(buffer)
+        except Exception as e:
+            self._fail_stage(e, stop_event)
+        finally:
+            try:
+                out.release()
+            except Exception as e:
+                self._fail_stage(e, stop_event)
+    
+    def _fail_stage(self, error, stop_event):
+        """Record the first error from a pipeline thread and stop all stages"""
+        if self._stage_error is None:
+            self._stage_error = error
+        stop_event.set()
+    
+    @staticmethod
+    def _pin_current_thread(core):
+        """Pin the calling thread to one CPU core (Linux only; no-op when core is None)"""
+        if core is None or not hasattr(os, 'sched_setaffinity'):
+            return
+        try:
+            os.sched_setaffinity(0, {core})
+        except OSError:
+            pass  # Pinning is only an optimization; keep running unpinned
+    
+    @staticmethod
+    def _get_unless_stopped(q, stop_event):
+        """Get an item from a queue, returning None if stop_event is set while waiting"""
+        while not stop_event.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+    
+    @staticmethod
+    def _put_unless_stopped(q, item, stop_event):
+        """Put item on a bounded queue, giving up if stop_event is set while waiting"""
+        while not stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def annotate_frame(self, frame, held_phones, held_devices, hands, frame_idx, fps,
+                       n_phones, n_devices, phone_hold_time=0.0, preserve_input=False):
+        """Annotate frame with bounding boxes and information
+        
+        held_phones/held_devices are the detections being held (the only ones drawn);
+        n_phones/n_devices are the total detection counts shown in the info line.
+        phone_hold_time is the hold timer at this frame, captured when it was analyzed.
+        Draws into `frame` in place unless preserve_input is True. With config.USE_OPENCL_DRAWING
+        the drawing runs on a cv2.UMat and a new array is returned instead.
+        """
+        # Config values used below, looked up once per frame
+        phone_label = config.CLASS_NAMES[config.CLASS_PHONE]
+        tap_label = config.CLASS_NAMES[config.CLASS_TAP_TO_PAY]
+        tap_color = config.TAP_TO_PAY_COLOR
+        draw_landmarks = config.DRAW_HAND_LANDMARKS
+        use_umat = config.USE_OPENCL_DRAWING
+        
+        if use_umat:
+            annotated_frame = cv2.UMat(frame)
+        else:
+            annotated_frame = frame.copy() if preserve_input else frame
+        
+        # Draw phone bounding boxes
+        for phone in held_phones:
+            annotated_frame = utils.draw_bounding_box(
+                annotated_frame, phone['bbox'], phone['confidence'], True, phone_label
+            )
+        
+        # Draw tap-to-pay device bounding boxes
+        for device in held_devices:
+            annotated_frame = utils.draw_tap_to_pay_box(
+                annotated_frame, device['bbox'], device['confidence'], True, tap_label
+            )
         
         # Draw hand landmarks (optional, for debugging)
-        if config.MAX_NUM_HANDS > 0:
-            for hand in hands:
-                landmarks = hand['landmarks']
-                for landmark in landmarks.landmark:
-                    x = int(landmark.x * frame.shape[1])
-                    y = int(landmark.y * frame.shape[0])
-                    cv2.circle(annotated_frame, (x, y), 3, (255, 0, 0), -1)
+        if draw_landmarks and hands:
+            coords = np.fromiter(
+                (v for hand in hands for landmark in hand['landmarks'].landmark for v in (landmark.x, landmark.y)),
+                dtype=np.float32
+            )
+            points = (coords.reshape(-1, 2) * np.float32([frame.shape[1], frame.shape[0]])).astype(np.int32)
+            # A closed single-point polyline renders as a filled dot (thickness 6 matches a radius-3 circle)
+            cv2.polylines(annotated_frame, list(points.reshape(-1, 1, 2)), True, (255, 0, 0), 6)
         
         # Add frame information
         timestamp = frame_idx / fps
-        info_text = f"Frame: {frame_idx} | Time: {timestamp:.2f}s | Phones: {len(phones)} | Tap-to-Pay: {len(tap_to_pay_devices)} | Hands: {len(hands)}"
+        info_text = f"Frame: {frame_idx} | Time: {timestamp:.2f}s | Phones: {n_phones} | Tap-to-Pay: {n_devices} | Hands: {len(hands)}"
         cv2.putText(annotated_frame, info_text, (10, 30), 
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
         
         # Add usage status for phones
-        phone_being_held = any(phone.get('is_being_held', False) for phone in phones)
-        if phone_being_held:
-            phone_hold_time = self.analyzer.get_phone_hold_duration()
+        if held_phones:
             status_text = f"ACTIVE PHONE USAGE - Hold Time: {phone_hold_time:.1f}s"
             status_color = (0, 255, 0)
             cv2.putText(annotated_frame, status_text, (10, 60), 
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
         
         # Add status for tap-to-pay devices (no active usage message)
-        tap_to_pay_being_held = any(device.get('is_being_held', False) for device in tap_to_pay_devices)
-        if tap_to_pay_being_held:
+        if held_devices:
             device_text = "TAP-TO-PAY DEVICE IN USE"
             cv2.putText(annotated_frame, device_text, (10, 90), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, config.TAP_TO_PAY_COLOR, 2)
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, tap_color, 2)
         
+        if use_umat:
+            return annotated_frame.get()
         return annotated_frame
     
     def preserve_audio(self, input_path, output_path):
         """Preserve original audio in the output video"""
+        # Create temporary output path
+        temp_output = output_path.replace('.mp4', '_temp.mp4')
+        
+        # Remux: copy the processed video stream and the original audio stream without re-encoding
+        try:
+            subprocess.run(
+                [self._ffmpeg_executable(), '-y', '-loglevel', 'error',
+                 '-i', output_path, '-i', input_path,
+                 '-map', '0:v:0', '-map', '1:a:0?', '-c', 'copy', '-shortest', temp_output],
+                check=True
+            )
+            os.replace(temp_output, output_path)
+            print("Audio preserved successfully!")
+            return
+        except Exception as e:
+            print(f"Stream-copy audio mux failed ({e}), re-encoding with moviepy...")
+        
         try:
             # Load original video with audio
             original_video = VideoFileClip(input_path)
@@ -199,9 +539,6 @@ class VideoProcessor:
             # Combine processed video with original audio
             final_video = processed_video.set_audio(original_video.audio)
             
-            # Create temporary output path
-            temp_output = output_path.replace('.mp4', '_temp.mp4')
-            
             # Write final video with audio
             final_video.write_videofile(temp_output, codec='libx264', audio_codec='aac')
             
@@ -219,48 +556,77 @@ class VideoProcessor:
             print(f"Warning: Could not preserve audio: {e}")
             print("Output video will be without audio.")
     
+    @staticmethod
+    def _ffmpeg_executable():
+        """Return the FFmpeg binary, falling back to the one bundled with moviepy (imageio-ffmpeg)"""
+        ffmpeg = shutil.which(config.FFMPEG_PATH)
+        if ffmpeg is None:
+            import imageio_ffmpeg
+            ffmpeg = imageio_ffmpeg.get_ffmpeg_exe()
+        return ffmpeg
+    
+    def _reset_usage_columns(self, expected_frames, fps):
+        """Preallocate one array per scalar usage field, indexed by frame"""
+        capacity = max(int(expected_frames), 1)
+        self.usage_columns = {
+            name: np.zeros(capacity, dtype=dtype) for name, dtype in self.USAGE_COLUMNS.items()
+        }
+        self.frames_logged = 0
+        self.fps = fps
+    
+    def _log_usage(self, frame_idx, frame_data):
+        """Record the scalar fields of frame_data in the usage columns"""
+        capacity = len(self.usage_columns['active_phone_usage'])
+        if frame_idx >= capacity:
+            new_capacity = max(capacity * 2, frame_idx + 1)
+            for name, column in self.usage_columns.items():
+                grown = np.zeros(new_capacity, dtype=column.dtype)
+                grown[:capacity] = column
+                self.usage_columns[name] = grown
+        
+        for name, column in self.usage_columns.items():
+            column[frame_idx] = frame_data[name]
+        self.frames_logged = max(self.frames_logged, frame_idx + 1)
+    
     def get_usage_summary(self):
         """Get summary of phone usage from processed video"""
-        if not self.usage_data:
+        total_frames = self.frames_logged
+        if not total_frames:
             return None
         
-        total_frames = len(self.usage_data)
-        active_phone_frames = sum(1 for frame in self.usage_data if frame['active_phone_usage'])
+        active = self.usage_columns['active_phone_usage'][:total_frames]
+        active_phone_frames = int(np.count_nonzero(active))
         usage_percentage = (active_phone_frames / total_frames) * 100
         
-        # Find phone usage sessions
-        usage_sessions = []
-        current_session = None
-        
-        for frame in self.usage_data:
-            if frame['active_phone_usage']:
-                if current_session is None:
-                    current_session = {
-                        'start_time': frame['timestamp'],
-                        'start_frame': frame['frame_idx']
-                    }
-            else:
-                if current_session is not None:
-                    current_session['end_time'] = frame['timestamp']
-                    current_session['end_frame'] = frame['frame_idx']
-                    current_session['duration'] = current_session['end_time'] - current_session['start_time']
-                    usage_sessions.append(current_session)
-                    current_session = None
-        
-        # Handle case where video ends with active usage
-        if current_session is not None:
-            last_frame = self.usage_data[-1]
-            current_session['end_time'] = last_frame['timestamp']
-            current_session['end_frame'] = last_frame['frame_idx']
-            current_session['duration'] = current_session['end_time'] - current_session['start_time']
-            usage_sessions.append(current_session)
+        # Find phone usage sessions from rising/falling edges of the active column.
+        # A session ends at the first inactive frame, or at the last frame if still active.
+        edges = np.diff(active.view(np.int8), prepend=0, append=0)  # bool -> int8 view, no copy
+        start_frames = np.flatnonzero(edges == 1)
+        end_frames = np.minimum(np.flatnonzero(edges == -1), total_frames - 1)
+        start_times = start_frames / self.fps
+        end_times = end_frames / self.fps
+        durations = end_times - start_times
+        
+        usage_sessions = [
+            {
+                'start_time': start_time,
+                'start_frame': start_frame,
+                'end_time': end_time,
+                'end_frame': end_frame,
+                'duration': duration
+            }
+            for start_frame, end_frame, start_time, end_time, duration in zip(
+                start_frames.tolist(), end_frames.tolist(),
+                start_times.tolist(), end_times.tolist(), durations.tolist()
+            )
+        ]
         
         return {
             'total_frames': total_frames,
             'active_frames': active_phone_frames,
             'usage_percentage': usage_percentage,
             'usage_sessions': usage_sessions,
-            'total_usage_time': sum(session['duration'] for session in usage_sessions),
+            'total_usage_time': float(durations.sum()),
             'total_phone_hold_time': self.analyzer.get_total_phone_hold_duration()
         }
     